@@ -0,0 +1,86 @@
+#!coding: utf-8
+"""
+Compare serial and parallel directory walking of build_tree on synthetic trees.
+
+Network storage is emulated by adding a delay to each directory listing::
+
+    PYTHONPATH=src python benchmarks/bench_build_tree.py --latency 0.002 --workers 1 4 16
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import mylib.deps
+
+
+def make_tree(root: str, depth: int, width: int, modules: int) -> None:
+    """
+    Create a synthetic source tree made of packages.
+
+    :param root: directory where the tree is created
+    :param depth: number of nested package levels
+    :param width: number of sub-packages in each package
+    :param modules: number of modules in each package
+    """
+    frontier = [root]
+    for level in range(depth):
+        next_frontier = []
+        for directory in frontier:
+            for index in range(width):
+                package = os.path.join(directory, "pkg{}_{}".format(level, index))
+                os.mkdir(package)
+                with open(os.path.join(package, "__init__.py"), mode="w") as file_object:
+                    file_object.write("import os\n")
+                for module in range(modules):
+                    with open(os.path.join(package, "mod{}.py".format(module)), mode="w") as file_object:
+                        file_object.write("import numpy\n")
+                next_frontier.append(package)
+        frontier = next_frontier
+
+
+def bench(path: str, workers: int, repeat: int) -> float:
+    """
+    Return the best time to build the tree of path.
+
+    :param path: path to be investigated
+    :param workers: number of threads used to list directories
+    :param repeat: number of measurements
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        mylib.deps.build_tree(path, max_workers=workers)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay added to each directory listing (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="numbers of threads to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="number of measurements")
+    args = parser.parse_args()
+
+    if args.latency:
+        scan_directory = mylib.deps._scan_directory  # pylint: disable=protected-access
+
+        def _slow_scan_directory(path):
+            time.sleep(args.latency)
+            return scan_directory(path)
+        mylib.deps._scan_directory = _slow_scan_directory  # pylint: disable=protected-access
+
+    shapes = {"deep": (8, 2, 2), "wide": (2, 40, 5)}
+    for shape, (depth, width, modules) in shapes.items():
+        with tempfile.TemporaryDirectory() as root:
+            make_tree(root, depth, width, modules)
+            reference = None
+            for workers in args.workers:
+                timing = bench(root, workers, args.repeat)
+                reference = reference or timing
+                print("{:<5} depth={:<2} width={:<3} workers={:<3} {:8.3f} s  x{:.2f}".format(
+                    shape, depth, width, workers, timing, reference / timing))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ This is a dummy package for this template project to actually have something to
 from . import hello
 from . import version
 from . import deps
+from . import distributions
+from . import snapshot
+from . import diff
 
 
-__all__ = ["hello", "version", "deps"]
+__all__ = ["hello", "version", "deps", "distributions", "snapshot", "diff"]
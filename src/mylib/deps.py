@@ -6,11 +6,28 @@ import os
 import ast
 import uuid
 import json
-from typing import Optional, Sequence, Callable, Union, Tuple, Mapping
+import hashlib
+import importlib.machinery
+import concurrent.futures
+from typing import Optional, Sequence, Callable, Union, Tuple, Mapping, Iterator
 import sys
 
 import stdlib_list
 
+from .distributions import get_requirements, get_site_directories
+
+
+RESOLUTIONS = ("builtin", "installed", "internal", "missing")
+IMPORT_CONTEXTS = ("module", "function", "try", "except", "type_checking", "version_guard")
+
+_IMPORT_PRIORITY = {"package": 0, "shared_object": 1, "module": 2, "namespace": 3, "stub": 4, "directory": 5, "file": 6}
+_CODE_TYPES = {"package", "namespace", "module", "stub", "shared_object"}
+# Longest suffixes first, so that .cpython-37m-x86_64-linux-gnu.so is matched before .so
+_EXTENSION_SUFFIXES = tuple(sorted(importlib.machinery.EXTENSION_SUFFIXES, key=len, reverse=True))
+_IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+_VERSION_NAMES = {"version_info", "hexversion", "PY2", "PY3"}
+_TRY_NODES = tuple(getattr(ast, name) for name in ("Try", "TryStar") if hasattr(ast, name))
+
 
 def is_package(path: str) -> bool:
     """
@@ -39,13 +56,26 @@ def is_module(path: str) -> bool:
     return os.path.isfile(path) and path.endswith(".py")
 
 
+def _get_extension_suffix(path: str) -> Union[str, None]:
+    """
+    Get the extension module suffix of given path (such as .cpython-37m-x86_64-linux-gnu.so or .pyd), None is returned
+    if the path does not end with an extension module suffix.
+
+    :param path: path to be investigated
+    """
+    for suffix in _EXTENSION_SUFFIXES:
+        if path.endswith(suffix):
+            return suffix
+    return None
+
+
 def is_shared_object(path: str) -> bool:
     """
-    Stat whether given path is a shared object.
+    Stat whether given path is a shared object (extension module).
 
     :param path: path to be investigated
     """
-    return os.path.isfile(path) and path.endswith(".so")
+    return os.path.isfile(path) and _get_extension_suffix(path) is not None
 
 
 def is_file(path: str) -> bool:
@@ -57,65 +87,152 @@ def is_file(path: str) -> bool:
     return os.path.isfile(path)
 
 
-def build_tree(path: str, ignore_dirs: Optional[Sequence[str]] = None) -> dict:
+def build_tree(path: str, ignore_dirs: Optional[Sequence[str]] = None, max_workers: int = 1) -> dict:
     """
     Build a tree from a given path
 
+    Directories below path without __init__.py are considered as namespace packages if their name is a valid
+    identifier and they lead to Python code (packages, modules, stubs or extension modules). Stub files (.pyi) are
+    added to the tree so that imports can be resolved against them, but they are not parsed.
+
+    With max_workers greater than 1, directories are listed concurrently by a pool of threads before the tree is
+    assembled, which is faster for wide trees on file systems with a high latency (network storage). The tree built
+    is the same than with a single worker, children are always sorted by name.
+
     :param path: path to be investigated
     :param ignore_dirs: list of directory names to be excluded
+    :param max_workers: number of threads used to list directories
     :return: tree
     """
     if ignore_dirs is None:
         ignore_dirs = []
-    if is_module(path):
-        key = uuid.uuid4().hex
-        name = os.path.splitext(os.path.basename(path))[0]
-        item = {key: {
-            "name": name,
-            "path": os.path.abspath(path),
-            "components": [name],
-            "type": "module",
-        }}
-        return item
-    if is_shared_object(path):
+    if max_workers < 1:
+        raise ValueError("'max_workers' must be greater than or equal to 1")
+    if is_directory(path):
+        kind = "directory"
+    elif is_file(path):
+        kind = "file"
+    else:
+        return {}
+    if max_workers > 1 and kind == "directory":
+        listings = _list_tree(path, ignore_dirs, max_workers)
+    else:
+        listings = None
+    return _build_tree(path, kind, ignore_dirs, is_root=True, listings=listings)
+
+
+def _scan_directory(path: str) -> Sequence[Tuple[str, Union[str, None]]]:
+    """
+    List a directory. Entries are sorted by name and come with their kind: 'directory', 'file' or None (for special
+    files such as sockets).
+
+    :param path: path of the directory
+    """
+    entries = []
+    with os.scandir(path) as iterator:
+        for entry in iterator:
+            if entry.is_dir():
+                entries.append((entry.name, "directory"))
+            elif entry.is_file():
+                entries.append((entry.name, "file"))
+            else:
+                entries.append((entry.name, None))
+    return sorted(entries)
+
+
+def _list_tree(path: str, ignore_dirs: Sequence[str], max_workers: int) -> dict:
+    """
+    List all directories below path concurrently. A directory is submitted to the pool of threads as soon as its
+    parent has been listed.
+
+    :param path: path of the root directory
+    :param ignore_dirs: list of directory names to be excluded
+    :param max_workers: number of threads used to list directories
+    :return: entries of each directory (see _scan_directory) by path
+    """
+    listings = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_directory, path): path}
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                directory = pending.pop(future)
+                listings[directory] = future.result()
+                for name, kind in listings[directory]:
+                    if kind == "directory" and name not in ignore_dirs:
+                        child_path = os.path.join(directory, name)
+                        pending[executor.submit(_scan_directory, child_path)] = child_path
+    return listings
+
+
+def _build_tree(path: str,
+                kind: str,
+                ignore_dirs: Sequence[str],
+                is_root: bool,
+                listings: Optional[dict] = None
+                ) -> dict:
+    """
+    Build a tree from a given path
+
+    :param path: path to be investigated
+    :param kind: either 'directory' or 'file'
+    :param ignore_dirs: list of directory names to be excluded
+    :param is_root: whether path is the root of the tree, which is never a namespace package
+    :param listings: entries of directories by path (see _list_tree), directories are listed on the fly if None
+    :return: tree
+    """
+    if kind == "file":
+        return _build_file(path)
+    if kind == "directory":
+        entries = listings[path] if listings is not None else _scan_directory(path)
+        children = {}
+        for child, child_kind in entries:
+            if child not in ignore_dirs:
+                children.update(_build_tree(os.path.join(path, child), child_kind, ignore_dirs, is_root=False,
+                                            listings=listings))
         key = uuid.uuid4().hex
-        name = os.path.basename(path).partition(".")[0]
+        name = os.path.basename(path)
+        if ("__init__.py", "file") in entries:
+            node_type = "package"
+        elif not is_root and name.isidentifier() and any(x["type"] in _CODE_TYPES for x in children.values()):
+            node_type = "namespace"
+        else:
+            node_type = "directory"
+            name = None
+        apply_tree(children, lambda x: x["components"].insert(0, name))
         return {key: {
             "name": name,
             "path": os.path.abspath(path),
             "components": [name],
-            "type": "shared_object"
+            "type": node_type,
+            "children": children
         }}
-    if is_file(path):
-        key = uuid.uuid4().hex
-        return {key: {
-            "name": None,
-            "path": os.path.abspath(path),
-            "components": [None],
-            "type": "file"
-        }}
-    if is_directory(path):
-        key = uuid.uuid4().hex
-        name = os.path.basename(path)
-        item = {key: {
-            "name": name if is_package(path) else None,
-            "path": os.path.abspath(path),
-            "components": [name] if is_package(path) else [None],
-            "type": "package" if is_package(path) else "directory",
-            "children": {}
-        }}
-        for child in os.listdir(path):
-            if child not in ignore_dirs:
-                child_path = os.path.join(path, child)
-                info = build_tree(child_path, ignore_dirs)
-                if info:
-                    if "children" in item[key]:
-                        apply_tree(info, lambda x: x["components"].insert(0, item[key]["name"]))
-                    item[key]["children"].update(info)
-        return item
     return {}
 
 
+def _build_file(path: str) -> dict:
+    """
+    Build a tree made of a single file: module, stub, extension module or any other file.
+
+    :param path: path of the file
+    :return: tree
+    """
+    key = uuid.uuid4().hex
+    if path.endswith(".py") or path.endswith(".pyi"):
+        name = os.path.splitext(os.path.basename(path))[0]
+        node_type = "module" if path.endswith(".py") else "stub"
+    else:
+        suffix = _get_extension_suffix(path)
+        name = None if suffix is None else os.path.basename(path)[:-len(suffix)]
+        node_type = "file" if suffix is None else "shared_object"
+    return {key: {
+        "name": name,
+        "path": os.path.abspath(path),
+        "components": [name],
+        "type": node_type
+    }}
+
+
 def apply_tree(tree: dict, func: Callable, args: Optional[Tuple] = None, kwargs: Optional[Mapping] = None) -> None:
     """
     Apply a function to all items in the specified tree.
@@ -239,25 +356,114 @@ def _find_all_tree(tree: dict,
     return found
 
 
+def _catches_import_error(handler: ast.ExceptHandler) -> bool:
+    """
+    Stat whether an except clause catches ImportError.
+
+    :param handler: except clause
+    """
+    if handler.type is None:
+        return True
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    for node in types:
+        name = node.id if isinstance(node, ast.Name) else getattr(node, "attr", None)
+        if name in _IMPORT_ERRORS:
+            return True
+    return False
+
+
+def _is_type_checking(test: ast.expr) -> bool:
+    """
+    Stat whether the test of an if statement is typing.TYPE_CHECKING.
+
+    :param test: test of the if statement
+    """
+    return (isinstance(test, ast.Name) and test.id == "TYPE_CHECKING") or \
+        (isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING")
+
+
+def _is_version_guard(test: ast.expr) -> bool:
+    """
+    Stat whether the test of an if statement depends on Python version (sys.version_info, six.PY2...).
+
+    :param test: test of the if statement
+    """
+    for node in ast.walk(test):
+        if isinstance(node, ast.Name) and node.id in _VERSION_NAMES:
+            return True
+        if isinstance(node, ast.Attribute) and node.attr in _VERSION_NAMES:
+            return True
+    return False
+
+
+def _walk_imports(tree: ast.AST) -> Iterator[Tuple[ast.AST, frozenset]]:
+    """
+    Browse the syntax tree of a module and yield import statements along with the contexts they are found in (see
+    IMPORT_CONTEXTS).
+
+    :param tree: syntax tree of the module
+    """
+    frontier = [(tree, frozenset())]
+    while frontier:
+        node, contexts = frontier.pop()
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node, contexts
+            continue
+        children = []
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            children = [(child, contexts | {"function"}) for child in ast.iter_child_nodes(node)]
+        elif isinstance(node, _TRY_NODES):
+            guarded = [handler for handler in node.handlers if _catches_import_error(handler)]
+            children.extend((child, contexts | {"try"} if guarded else contexts) for child in node.body)
+            children.extend((handler, contexts | {"except"} if handler in guarded else contexts)
+                            for handler in node.handlers)
+            children.extend((child, contexts) for child in node.orelse + node.finalbody)
+        elif isinstance(node, ast.If) and _is_type_checking(node.test):
+            children.extend((child, contexts | {"type_checking"}) for child in node.body)
+            children.extend((child, contexts) for child in node.orelse)
+        elif isinstance(node, ast.If) and _is_version_guard(node.test):
+            children.extend((child, contexts | {"version_guard"}) for child in node.body + node.orelse)
+        else:
+            children = [(child, contexts) for child in ast.iter_child_nodes(node)]
+        frontier.extend(reversed(children))
+
+
 def get_imports(path: str) -> dict:
     """
     This function parse the module at specified path to look for import statements and return a dictionary
     representing the import statement.
 
+    Each import statement is annotated with the contexts it is found in (see IMPORT_CONTEXTS): within a function,
+    within a try block catching ImportError, within the except clause catching it (fallback imports), within an
+    'if TYPE_CHECKING:' block or within a block depending on Python version. Import statements found in none of these
+    are annotated with the 'module' context.
+
     :param path: path to the Python module
     :return: information related to the import statements
     """
+    with open(path, mode="rb") as file_object:
+        return _parse_imports(file_object.read())
+
+
+def _parse_imports(source: bytes) -> dict:
+    """
+    Parse source code of a module to look for import statements (see get_imports).
+
+    :param source: source code of the module
+    :return: information related to the import statements
+    """
     imports = {}
-    with open(path, mode="r") as file_object:
-        tree = ast.parse(file_object.read())
-    for node in ast.walk(tree):
+    tree = ast.parse(source)
+    for node, contexts in _walk_imports(tree):
+        contexts = sorted(contexts) if contexts else ["module"]
         if isinstance(node, ast.Import):
             for module in node.names:
-                imports[uuid.uuid4().hex] = {"name": module.name, "type": "import", "alias": module.asname}
+                imports[uuid.uuid4().hex] = {"name": module.name, "type": "import", "alias": module.asname,
+                                             "contexts": contexts}
         elif isinstance(node, ast.ImportFrom):
             for name in node.names:
                 imports[uuid.uuid4().hex] = {"module": node.module, "name": name.name, "alias": name.asname,
-                                             "type": "from-import", "level": node.level}
+                                             "type": "from-import", "level": node.level, "contexts": contexts}
     return imports
 
 
@@ -284,37 +490,116 @@ def _build_fullname(tree: dict) -> None:
 
 def _build_imports(tree: dict) -> None:
     """
-    Add imports variable in tree.
+    Add imports variable in tree, along with the hash of the source code of modules.
 
     :param tree: tree to be updated
     """
     def _apply(item: dict) -> None:
         if item["type"] == "module":
-            item["imports"] = get_imports(item["path"])
+            with open(item["path"], mode="rb") as file_object:
+                source = file_object.read()
+            item["hash"] = hashlib.sha1(source).hexdigest()
+            item["imports"] = _parse_imports(source)
     apply_tree(tree, _apply)
 
 
-def _look_in_package(tree: dict, module_path: str, name: str, level: Optional[int] = None) -> Union[str, None]:
+def get_module_external_imports(item: dict) -> set:
+    """
+    Get top-level packages of the external imports of a module item (see lookup_imports_tree).
+
+    :param item: module item
+    """
+    names = {_get_external_name(import_item) for import_item in item["imports"].values()}
+    return {name.partition(".")[0] for name in names if name is not None}
+
+
+def _build_hashes(tree: dict) -> None:
+    """
+    Add hash variable to directories in tree, computed from the names, types and hashes of their children as well as
+    from the external imports of the modules they contain. Directories with the same hash in two trees have the same
+    imports, whatever their location on disk. Items other than modules and directories have a None hash.
+
+    :param tree: tree to be updated
+    """
+    def _hash(item: dict) -> str:
+        if "children" in item:
+            digest = hashlib.sha1()
+            children = sorted(((os.path.basename(x["path"]), x) for x in item["children"].values()), key=lambda x: x[0])
+            for name, child in children:
+                digest.update("{}\0{}\0{}\n".format(name, child["type"], _hash(child)).encode("utf-8"))
+            item["hash"] = digest.hexdigest()
+        elif item["type"] == "module":
+            return "{}\0{}".format(item["hash"], ",".join(sorted(get_module_external_imports(item))))
+        else:
+            item["hash"] = None
+        return item["hash"] or ""
+    for item in tree.values():
+        _hash(item)
+
+
+def _index_tree(tree: dict) -> Tuple[dict, dict, dict]:
+    """
+    Index items of tree by path and by fullname so that imports can be looked for without browsing the whole tree.
+
+    When several items share the same fullname, the one picked by the import system is kept (packages first, then
+    extension modules, modules and namespace packages). Stubs are only kept if nothing else has the same fullname.
+
+    Leading namespace packages of a fullname may be plain directories put on sys.path (such as src in a src layout),
+    items are therefore also indexed under their fullname without them: src.mypackage.module is indexed as
+    mypackage.module too.
+
+    :param tree: tree to be indexed
+    :return: items by path, items by fullname and names of items (fullname first) by path
+    """
+    by_path = {}
+    by_fullname = {}
+    names = {}
+    # Items come with the number of namespace packages their fullname starts with
+    frontier = [(item, 0) for item in tree.values()]
+    while frontier:
+        item, namespaces = frontier.pop()
+        by_path[item["path"]] = item
+        fullname = item["fullname"]
+        if fullname is not None:
+            names[item["path"]] = [fullname.split(".", count)[-1] for count in range(namespaces + 1)]
+            for name in names[item["path"]]:
+                current = by_fullname.get(name)
+                if current is None or _IMPORT_PRIORITY[item["type"]] < _IMPORT_PRIORITY[current["type"]]:
+                    by_fullname[name] = item
+        if fullname is None:
+            namespaces = 0
+        elif item["type"] == "namespace" and namespaces == fullname.count("."):
+            namespaces += 1
+        frontier.extend((child, namespaces) for child in item.get("children", {}).values())
+    return by_path, by_fullname, names
+
+
+def _look_in_package(index: Tuple[dict, dict, dict],
+                     module_path: str,
+                     name: str,
+                     level: Optional[int] = None
+                     ) -> Union[str, None]:
     """
     Look for target of an import in the package
 
-    :param tree: tree to be investigated
+    :param index: indexes of the tree investigated (see _index_tree)
     :param module_path: path to the module from which the imports are looked for
     :param name: name of the import
     :param level: ancestor level in the case of a relative import
     """
+    by_path, by_fullname, _ = index
     parent_path = os.path.dirname(module_path)
     if level is not None:
         for _ in range(level - 1):
             parent_path = os.path.dirname(parent_path)
-    parent = find_tree(tree, lambda x, p: x["path"] in [p, os.path.join(p, "__init__.py")], args=(parent_path,))
+    parent = by_path.get(parent_path, by_path.get(os.path.join(parent_path, "__init__.py")))
     if parent:
         if parent["fullname"] in [name, "{}.__init__".format(name)]:
             return parent["path"]
-        for child in parent["children"].values():
-            if child["name"] == name:
-                return child["path"]
-        target = find_tree(tree, lambda x, f: x["fullname"] == f, args=("{}.{}".format(parent["fullname"], name),))
+        children = [child for child in parent.get("children", {}).values() if child["name"] == name]
+        if children:
+            return min(children, key=lambda x: _IMPORT_PRIORITY[x["type"]])["path"]
+        target = by_fullname.get("{}.{}".format(parent["fullname"], name))
         if target:
             return target["path"]
     return None
@@ -376,31 +661,30 @@ def _build_lookup(tree: dict, stdlib_lookup: bool = False) -> None:
     :param tree: tree to be updated
     :param stdlib_lookup: toggle lookup to Python standard library
     """
+    index = _index_tree(tree)
+    _, by_fullname, names = index
+
     def _apply(item: dict, python_stdlib: set) -> None:
         if item["type"] == "module" and item["imports"]:
-            package = item["fullname"].partition(".")[0]
+            packages = {x.partition(".")[0] for x in names[item["path"]]}
             for import_module in item["imports"].values():
                 import_module["lookup"] = None
                 name, level, relative = _get_name_level_relative_import_module(import_module)
                 # So we first try to find a module with the expected name in the same directory
                 # We look the parent item of the current module
-                target = _look_in_package(tree, item["path"], name, level=level)
+                target = _look_in_package(index, item["path"], name, level=level)
                 if target:
                     import_module["lookup"] = target
                 else:
                     # We now look if a package or module has the same name (within the same package)
-                    target = find_tree(
-                        tree,
-                        lambda x, n, p: (x["fullname"] == n) and (x["fullname"].partition(".")[0] == p),
-                        args=(name, package)
-                    )
-                    if target:
+                    target = by_fullname.get(name)
+                    if target and packages.intersection(x.partition(".")[0] for x in names[target["path"]]):
                         import_module["lookup"] = target["path"]
                     elif relative:
                         # We haven't found so it might be a symbol imported by a package in __init__.py
                         # We don't want to let an internal reference as not found
                         import_module["lookup"] = "@internal"
-                    elif name.partition(".")[0] == item["fullname"].partition(".")[0]:
+                    elif name.partition(".")[0] in packages:
                         # This is in case a module from within the same package has not been found
                         # We don't want to let an internal reference as not found
                         import_module["lookup"] = "@internal"
@@ -421,26 +705,182 @@ def lookup_imports_tree(tree: dict, stdlib_lookup: bool = False) -> None:
     _build_fullname(tree)
     _build_imports(tree)
     _build_lookup(tree, stdlib_lookup)
+    _build_hashes(tree)
+
+
+def _list_directory(path: str, listings: dict) -> frozenset:
+    """
+    List entry names of a directory, listings are cached so that a directory is scanned only once.
+
+    :param path: path of the directory
+    :param listings: cache of directory listings, updated in place
+    """
+    listing = listings.get(path)
+    if listing is None:
+        try:
+            with os.scandir(path) as entries:
+                listing = frozenset(entry.name for entry in entries)
+        except OSError:
+            listing = frozenset()
+        listings[path] = listing
+    return listing
+
+
+def is_builtin(name: str) -> bool:
+    """
+    Stat whether the top-level package or module of an import is built in the interpreter (or frozen), in which case
+    it is not provided by any path entry.
+
+    :param name: name of the import
+    """
+    top_level = name.partition(".")[0]
+    return top_level in sys.builtin_module_names or importlib.machinery.FrozenImporter.find_spec(top_level) is not None
+
+
+def _find_in_directories(top_level: str, directories: Sequence[str], listings: dict) -> Union[str, None]:
+    """
+    Look for a top-level package or module in directories (see find_installed).
+
+    :param top_level: name of the top-level package or module
+    :param directories: absolute paths of existing directories (see get_site_directories)
+    :param listings: cache of directory listings, updated in place
+    """
+    candidates = [top_level] + [top_level + suffix for suffix in importlib.machinery.all_suffixes()]
+    for path in directories:
+        listing = _list_directory(path, listings)
+        for candidate in candidates:
+            if candidate in listing:
+                return os.path.join(path, candidate)
+    return None
+
+
+def find_installed(name: str,
+                   paths: Optional[Sequence[str]] = None,
+                   listings: Optional[dict] = None
+                   ) -> Union[str, None]:
+    """
+    Look for the top-level package or module of an import in the specified paths.
+
+    Only the file system is probed (nothing is imported): a path entry provides the import if it contains a directory
+    (regular or namespace package) or a file with one of the suffixes known by the import system (source, bytecode
+    or extension module). Modules built in the interpreter are not looked for in paths, '@builtin' is returned for
+    them.
+
+    :param name: name of the import
+    :param paths: paths to be investigated (by default sys.path is used)
+    :param listings: cache of directory listings, to be shared between calls
+    :return: path to the package or module found, '@builtin' for built-in modules, None otherwise
+    """
+    if is_builtin(name):
+        return "@builtin"
+    if listings is None:
+        listings = {}
+    return _find_in_directories(name.partition(".")[0], get_site_directories(paths), listings)
+
+
+def _get_external_name(import_item: dict) -> Union[str, None]:
+    """
+    Get the name of the module imported by an unresolved import item, None is returned if the import has been
+    resolved.
+
+    :param import_item: import item
+    """
+    if import_item["lookup"] is None:
+        if import_item["type"] == "import":
+            return import_item["name"]
+        if import_item["type"] == "from-import":
+            return import_item["module"]
+    return None
+
+
+def _resolve_name(top_level: str, directories: Sequence[str], listings: dict, names: set) -> str:
+    """
+    Classify a top-level package or module (see resolve_imports_tree).
+
+    :param top_level: name of the top-level package or module
+    :param directories: absolute paths of existing directories (see get_site_directories)
+    :param listings: cache of directory listings, updated in place
+    :param names: names of the modules and packages of the tree
+    """
+    if is_builtin(top_level):
+        return "builtin"
+    if _find_in_directories(top_level, directories, listings) is not None:
+        return "installed"
+    if top_level in names:
+        return "internal"
+    return "missing"
+
+
+def resolve_imports_tree(tree: dict,
+                         paths: Optional[Sequence[str]] = None,
+                         listings: Optional[dict] = None
+                         ) -> None:
+    """
+    Classify imports which have not been found in tree (see lookup_imports_tree). A resolution variable is added to
+    each of them:
+
+    - builtin: the import is built in the interpreter
+    - installed: the import is provided by a path entry
+    - internal: the import is not provided by a path entry but a module or package of the tree has the same name
+    - missing: the import cannot be found anywhere
+
+    Path entries are listed once and imports are classified once per top-level name.
+
+    :param tree: tree to be updated
+    :param paths: paths to be investigated (by default sys.path is used)
+    :param listings: cache of directory listings, to be shared between calls
+    """
+    if listings is None:
+        listings = {}
+    directories = get_site_directories(paths)
+    names = {item["name"] for item in find_tree(tree, lambda x: x["name"] is not None, how="all")}
+    resolutions = {}
+
+    def _apply(item: dict) -> None:
+        if item["type"] == "module":
+            for import_item in item["imports"].values():
+                name = _get_external_name(import_item)
+                if name is None:
+                    continue
+                top_level = name.partition(".")[0]
+                if top_level not in resolutions:
+                    resolutions[top_level] = _resolve_name(top_level, directories, listings, names)
+                import_item["resolution"] = resolutions[top_level]
+    apply_tree(tree, _apply)
 
 
 def get_external_imports(tree: dict,
-                         only_top_level: bool = True) -> set:
+                         only_top_level: bool = True,
+                         resolutions: Optional[Sequence[str]] = None,
+                         exclude_contexts: Optional[Sequence[str]] = None) -> set:
     """
     Get external imports from given tree
 
     :param tree: tree to be investigated
     :param only_top_level: only return the top-level package of dependency
-    """
+    :param resolutions: only return imports with one of these resolutions (see resolve_imports_tree)
+    :param exclude_contexts: ignore imports found in any of these contexts (see IMPORT_CONTEXTS)
+    """
+    if resolutions is not None and not set(resolutions).issubset(RESOLUTIONS):
+        raise ValueError("'resolutions' must only contain {}".format(", ".join(repr(r) for r in RESOLUTIONS)))
+    if exclude_contexts is not None and not set(exclude_contexts).issubset(IMPORT_CONTEXTS):
+        raise ValueError("'exclude_contexts' must only contain {}".format(
+            ", ".join(repr(c) for c in IMPORT_CONTEXTS)))
     external_imports = set()
     modules = find_tree(tree, lambda x: x["type"] == "module", how="all")
     for module in modules:
         for import_item in module["imports"].values():
-            if import_item["lookup"] is None:
-                if import_item["type"] == "import":
-                    external_imports.add(import_item["name"])
-                elif import_item["type"] == "from-import":
-                    if import_item["module"] is not None:
-                        external_imports.add(import_item["module"])
+            name = _get_external_name(import_item)
+            if name is None:
+                continue
+            # Trees written before imports were annotated with contexts only have module level imports
+            if exclude_contexts is not None and \
+                    any(context in exclude_contexts for context in import_item.get("contexts", ["module"])):
+                continue
+            if resolutions is not None and "resolution" not in import_item:
+                raise ValueError("imports have not been resolved, call resolve_imports_tree first")
+            if resolutions is None or import_item["resolution"] in resolutions:
+                external_imports.add(name)
     if only_top_level:
         external_imports = {i.partition(".")[0] for i in external_imports}
     return external_imports
@@ -450,19 +890,40 @@ def get_dependencies(path: str,
                      ignore_dirs: Optional[Sequence[str]] = None,
                      include_stdlib: bool = False,
                      only_top_level: bool = True,
+                     resolve_distributions: bool = False,
+                     site_paths: Optional[Sequence[str]] = None,
+                     cache_dir: Optional[str] = None,
+                     resolutions: Optional[Sequence[str]] = None,
+                     exclude_contexts: Optional[Sequence[str]] = None,
+                     max_workers: int = 1,
                      ) -> set:
     """
     Get all module / package dependencies for source code at given path.
 
+    When resolve_distributions is set, dependencies are returned as requirement specifications (such as
+    'PyYAML==5.3.1') using the index of installed distributions (see mylib.distributions).
+
     :param path: path of the source code to be analysed
     :param ignore_dirs: list of directory names to be ignored
     :param include_stdlib: toggle to include Python standard library in the dependencies
     :param only_top_level: only return the top-level package of dependency
+    :param resolve_distributions: toggle to convert import names into requirement specifications
+    :param site_paths: paths where installed packages are looked for (by default sys.path is used)
+    :param cache_dir: directory where the index of installed distributions is cached
+    :param resolutions: only return dependencies with one of these resolutions (see resolve_imports_tree)
+    :param exclude_contexts: ignore imports found in any of these contexts (see IMPORT_CONTEXTS), for example
+        ['function', 'try', 'type_checking'] only keeps imports required when the package is imported
+    :param max_workers: number of threads used to list directories (see build_tree)
     :return: set of dependencies
     """
-    tree = build_tree(path, ignore_dirs=ignore_dirs)
+    tree = build_tree(path, ignore_dirs=ignore_dirs, max_workers=max_workers)
     lookup_imports_tree(tree, stdlib_lookup=not include_stdlib)
-    return get_external_imports(tree, only_top_level)
+    if resolutions is not None:
+        resolve_imports_tree(tree, paths=site_paths)
+    dependencies = get_external_imports(tree, only_top_level, resolutions, exclude_contexts)
+    if resolve_distributions:
+        dependencies = get_requirements(dependencies, paths=site_paths, cache_dir=cache_dir)
+    return dependencies
 
 
 def write_tree(tree: dict, path: str) -> None:
@@ -474,3 +935,14 @@ def write_tree(tree: dict, path: str) -> None:
     """
     with open(path, mode="w", encoding="utf-8") as file_object:
         file_object.write(json.dumps(tree, indent=4))
+
+
+def read_tree(path: str) -> dict:
+    """
+    Read tree from a json file written by write_tree.
+
+    :param path: path of the json file
+    :return: tree
+    """
+    with open(path, mode="r", encoding="utf-8") as file_object:
+        return json.loads(file_object.read())
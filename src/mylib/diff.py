@@ -0,0 +1,112 @@
+#!coding: utf-8
+"""
+Compare imports of two trees
+"""
+import os
+from typing import Optional, Tuple
+
+from .deps import get_module_external_imports
+
+
+def _get_import_key(import_item: dict) -> Tuple:
+    """
+    Get a key identifying an import statement within a module.
+
+    :param import_item: import item
+    """
+    return import_item["type"], import_item.get("module"), import_item["name"], import_item["alias"], \
+        import_item.get("level")
+
+
+def _diff_modules(old: Optional[dict], new: Optional[dict], relpath: str, diff: dict) -> None:
+    """
+    Compare imports of two versions of a module and update diff.
+
+    :param old: old version of the module (None if the module has been added)
+    :param new: new version of the module (None if the module has been removed)
+    :param relpath: path of the module relative to the root of the tree
+    :param diff: differences to be updated (see diff_trees)
+    """
+    old_imports = {} if old is None else {_get_import_key(i): i for i in old["imports"].values()}
+    new_imports = {} if new is None else {_get_import_key(i): i for i in new["imports"].values()}
+    added = [dict(new_imports[key]) for key in new_imports if key not in old_imports]
+    removed = [dict(old_imports[key]) for key in old_imports if key not in new_imports]
+    if added or removed:
+        diff["modules"][relpath] = {"added": added, "removed": removed}
+    old_external = set() if old is None else get_module_external_imports(old)
+    new_external = set() if new is None else get_module_external_imports(new)
+    for name in sorted(new_external - old_external):
+        diff["external"].setdefault(name, {"added": [], "removed": []})["added"].append(relpath)
+    for name in sorted(old_external - new_external):
+        diff["external"].setdefault(name, {"added": [], "removed": []})["removed"].append(relpath)
+
+
+def _same_module(old: Optional[dict], new: Optional[dict]) -> bool:
+    """
+    Stat whether two versions of a module have the same source code and the same external imports.
+
+    :param old: old version of the module (None if the module has been added)
+    :param new: new version of the module (None if the module has been removed)
+    """
+    if old is None or new is None or old.get("hash") is None or old.get("hash") != new.get("hash"):
+        return False
+    return get_module_external_imports(old) == get_module_external_imports(new)
+
+
+def _diff_items(old: Optional[dict], new: Optional[dict], relpath: str, diff: dict) -> None:
+    """
+    Compare two versions of an item and update diff. Directories with the same hash are skipped.
+
+    :param old: old version of the item (None if the item has been added)
+    :param new: new version of the item (None if the item has been removed)
+    :param relpath: path of the item relative to the root of the tree
+    :param diff: differences to be updated (see diff_trees)
+    """
+    if old is not None and new is not None and "children" in old and "children" in new:
+        if old.get("hash") is not None and old.get("hash") == new.get("hash"):
+            return
+    modules = [item if item is not None and item["type"] == "module" else None for item in (old, new)]
+    if any(modules) and not _same_module(*modules):
+        _diff_modules(modules[0], modules[1], relpath, diff)
+    children = [{} if item is None else {os.path.basename(x["path"]): x for x in item.get("children", {}).values()}
+                for item in (old, new)]
+    for name in sorted(set(children[0]) | set(children[1])):
+        _diff_items(children[0].get(name), children[1].get(name), "{}/{}".format(relpath, name) if relpath else name,
+                    diff)
+
+
+def diff_trees(old: dict, new: dict) -> dict:
+    """
+    Compare imports of two trees (typically trees of two commits saved with mylib.deps.write_tree and loaded with
+    mylib.deps.read_tree).
+
+    Items are matched by their path relative to the root of the tree, so that both trees may have been built from
+    different locations. Directories whose hash has not changed are skipped (see mylib.deps.lookup_imports_tree), so
+    that the comparison time depends on the extent of the changes rather than on the size of the trees.
+
+    The differences are returned as a dictionary with two keys:
+
+    - modules: for each module (relative path) whose imports have changed, the added and removed imports
+    - external: for each top-level external package, the modules (relative paths) which started or stopped importing it
+
+    :param old: old tree
+    :param new: new tree
+    :return: differences
+    """
+    diff = {"modules": {}, "external": {}}
+    old_roots = list(old.values())
+    new_roots = list(new.values())
+    if len(old_roots) == 1 and len(new_roots) == 1:
+        pairs = [(old_roots[0], new_roots[0])]
+    else:
+        old_roots = {os.path.basename(x["path"]): x for x in old_roots}
+        new_roots = {os.path.basename(x["path"]): x for x in new_roots}
+        pairs = [(old_roots.get(name), new_roots.get(name)) for name in sorted(set(old_roots) | set(new_roots))]
+    for old_root, new_root in pairs:
+        root = new_root if new_root is not None else old_root
+        if len(pairs) == 1 and "children" in root:
+            relpath = ""
+        else:
+            relpath = os.path.basename(root["path"])
+        _diff_items(old_root, new_root, relpath, diff)
+    return diff
@@ -0,0 +1,282 @@
+#!coding: utf-8
+"""
+Index installed distributions
+
+The index maps top-level import names (such as ``yaml`` or ``sklearn``) to the distributions providing them (such as
+``PyYAML`` or ``scikit-learn``) along with their versions. It is built from the ``*.dist-info`` and ``*.egg-info``
+metadata found in site directories, persisted in a cache file and rebuilt only when one of the site directories is
+modified.
+"""
+import os
+import csv
+import sys
+import json
+import hashlib
+import importlib.machinery
+from typing import Optional, Sequence, Iterable, List, Tuple
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mylib")
+
+_INDEX_FORMAT = 1
+_METADATA_SUFFIXES = (".dist-info", ".egg-info")
+_loaded_indexes = {}
+
+
+def get_site_directories(paths: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Get the directories to be scanned for installed distributions.
+
+    Empty entries (current directory) and entries which are not directories (such as zip files) are discarded.
+
+    :param paths: paths to be considered (by default sys.path is used)
+    :return: list of absolute paths of directories, in the same order than paths
+    """
+    if paths is None:
+        paths = sys.path
+    directories = []
+    for path in paths:
+        if not path:
+            continue
+        path = os.path.abspath(path)
+        if os.path.isdir(path) and path not in directories:
+            directories.append(path)
+    return directories
+
+
+def _get_signature(directories: Sequence[str]) -> dict:
+    """
+    Get modification times of directories, used to invalidate a cached index.
+
+    :param directories: site directories
+    """
+    return {directory: os.stat(directory).st_mtime_ns for directory in directories}
+
+
+def _get_cache_file(directories: Sequence[str], cache_dir: Optional[str] = None) -> str:
+    """
+    Get the path of the cache file for the given environment.
+
+    :param directories: site directories
+    :param cache_dir: directory where cache files are stored (by default DEFAULT_CACHE_DIR is used)
+    """
+    if cache_dir is None:
+        cache_dir = DEFAULT_CACHE_DIR
+    digest = hashlib.sha1("\n".join([sys.executable] + list(directories)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "distributions-{}.json".format(digest[:16]))
+
+
+def _read_metadata(path: str) -> Tuple[str, str]:
+    """
+    Read distribution name and version from metadata.
+
+    When metadata cannot be read, name and version are guessed from the name of the metadata directory.
+
+    :param path: path to the .dist-info or .egg-info directory (or file for legacy egg-info)
+    :return: name and version of the distribution
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name, _, version = stem.partition("-")
+    version = version.partition("-")[0]
+    if os.path.isdir(path):
+        candidates = [os.path.join(path, "METADATA"), os.path.join(path, "PKG-INFO")]
+    else:
+        candidates = [path]
+    for candidate in candidates:
+        try:
+            with open(candidate, mode="r", encoding="utf-8", errors="replace") as file_object:
+                for line in file_object:
+                    if not line.strip():
+                        break
+                    key, _, value = line.partition(":")
+                    if key == "Name":
+                        name = value.strip()
+                    elif key == "Version":
+                        version = value.strip()
+        except OSError:
+            continue
+        break
+    return name, version
+
+
+def _read_top_level_txt(path: str) -> Optional[List[str]]:
+    """
+    Read the import names listed in top_level.txt, None is returned if the file cannot be read.
+
+    :param path: path to the .dist-info or .egg-info directory
+    """
+    names = []
+    try:
+        with open(os.path.join(path, "top_level.txt"), mode="r", encoding="utf-8") as file_object:
+            for line in file_object:
+                name = line.strip().replace("/", ".")
+                if name and name not in names:
+                    names.append(name)
+    except OSError:
+        return None
+    return names
+
+
+def _get_record_name(record_path: str) -> Optional[str]:
+    """
+    Get the import name corresponding to a file listed in RECORD, None is returned if the file is not importable.
+
+    :param record_path: path of the file relative to the site directory
+    """
+    first, separator, _ = record_path.partition("/")
+    if not separator:
+        # This is a file at the root of the site directory, we only keep modules
+        for suffix in importlib.machinery.all_suffixes():
+            if first.endswith(suffix):
+                first = first[:-len(suffix)]
+                break
+        else:
+            return None
+    if first.isidentifier() and first != "__pycache__":
+        return first
+    return None
+
+
+def _read_record(path: str) -> List[str]:
+    """
+    Derive import names from the first component of the files listed in RECORD.
+
+    :param path: path to the .dist-info directory
+    """
+    names = []
+    try:
+        with open(os.path.join(path, "RECORD"), mode="r", encoding="utf-8", newline="") as file_object:
+            for row in csv.reader(file_object):
+                name = _get_record_name(row[0]) if row else None
+                if name is not None and name not in names:
+                    names.append(name)
+    except OSError:
+        pass
+    return names
+
+
+def _read_top_level(path: str) -> List[str]:
+    """
+    Read the top-level import names provided by a distribution.
+
+    top_level.txt is used when available, otherwise the names are derived from the first component of the files listed
+    in RECORD.
+
+    :param path: path to the .dist-info or .egg-info directory
+    :return: list of import names
+    """
+    if not os.path.isdir(path):
+        return []
+    names = _read_top_level_txt(path)
+    if names is None:
+        names = _read_record(path)
+    return names
+
+
+def build_distribution_index(paths: Optional[Sequence[str]] = None) -> dict:
+    """
+    Build an index of installed distributions by scanning site directories.
+
+    The index maps each top-level import name to a list of distributions, each distribution being a dictionary with
+    name and version keys. Several distributions may provide the same import name (namespace packages for example).
+
+    :param paths: paths to be scanned (by default sys.path is used)
+    :return: index including the signature used for invalidation
+    """
+    directories = get_site_directories(paths)
+    signature = _get_signature(directories)
+    distributions = {}
+    for directory in directories:
+        for entry in sorted(os.scandir(directory), key=lambda x: x.name):
+            if not entry.name.endswith(_METADATA_SUFFIXES):
+                continue
+            name, version = _read_metadata(entry.path)
+            for import_name in _read_top_level(entry.path):
+                distribution = {"name": name, "version": version}
+                providers = distributions.setdefault(import_name, [])
+                if distribution not in providers:
+                    providers.append(distribution)
+    return {"format": _INDEX_FORMAT, "signature": signature, "distributions": distributions}
+
+
+def _load_index(cache_file: str) -> Optional[dict]:
+    """
+    Load a cached index, None is returned if the cache file cannot be read.
+
+    :param cache_file: path to the cache file
+    """
+    try:
+        with open(cache_file, mode="r", encoding="utf-8") as file_object:
+            index = json.loads(file_object.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("format") != _INDEX_FORMAT:
+        return None
+    return index
+
+
+def _save_index(index: dict, cache_file: str) -> None:
+    """
+    Save index in cache file. Failing to write the cache is not an error, the index is simply rebuilt next time.
+
+    :param index: index to be saved
+    :param cache_file: path to the cache file
+    """
+    temporary_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temporary_file, mode="w", encoding="utf-8") as file_object:
+            file_object.write(json.dumps(index))
+        os.replace(temporary_file, cache_file)
+    except OSError:
+        pass
+
+
+def get_distribution_index(paths: Optional[Sequence[str]] = None, cache_dir: Optional[str] = None) -> dict:
+    """
+    Get the index of installed distributions.
+
+    The index is built once per environment and persisted in cache_dir. It is rebuilt when the modification time of
+    one of the site directories has changed (which happens when a distribution is installed, upgraded or removed).
+
+    :param paths: paths to be scanned (by default sys.path is used)
+    :param cache_dir: directory where cache files are stored (by default DEFAULT_CACHE_DIR is used)
+    :return: mapping of import names to list of distributions
+    """
+    directories = get_site_directories(paths)
+    signature = _get_signature(directories)
+    cache_file = _get_cache_file(directories, cache_dir)
+    index = _loaded_indexes.get(cache_file)
+    if index is None or index["signature"] != signature:
+        index = _load_index(cache_file)
+        if index is None or index["signature"] != signature:
+            index = build_distribution_index(directories)
+            _save_index(index, cache_file)
+        _loaded_indexes[cache_file] = index
+    return index["distributions"]
+
+
+def get_requirements(import_names: Iterable[str],
+                     paths: Optional[Sequence[str]] = None,
+                     cache_dir: Optional[str] = None
+                     ) -> set:
+    """
+    Convert import names into requirement specifications such as 'PyYAML==5.3.1'.
+
+    Import names which are not provided by any installed distribution are returned unchanged.
+
+    :param import_names: import names (only the top-level package is considered)
+    :param paths: paths to be scanned (by default sys.path is used)
+    :param cache_dir: directory where cache files are stored (by default DEFAULT_CACHE_DIR is used)
+    :return: set of requirement specifications
+    """
+    index = get_distribution_index(paths, cache_dir)
+    requirements = set()
+    for import_name in import_names:
+        distributions = index.get(import_name.partition(".")[0])
+        if distributions:
+            for distribution in distributions:
+                requirements.add("{}=={}".format(distribution["name"], distribution["version"]))
+        else:
+            requirements.add(import_name)
+    return requirements
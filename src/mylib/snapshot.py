@@ -0,0 +1,378 @@
+#!coding: utf-8
+"""
+Publish trees in flat read-only buffers
+
+A finished tree (see mylib.deps.lookup_imports_tree) is serialized into a single buffer made of fixed-size records
+for items and imports plus a string table. The buffer can be published in shared memory or written to a file which is
+then memory-mapped, so that several processes can query the same tree without rebuilding or deserializing it.
+
+TreeSnapshot.tree exposes the buffer as read-only mappings decoded lazily, which can be passed to functions of
+mylib.deps such as find_tree or get_external_imports::
+
+    shm = publish_snapshot(tree, name="my_tree")
+    # in another process
+    with TreeSnapshot.from_shared_memory("my_tree") as snapshot:
+        dependencies = get_external_imports(snapshot.tree)
+"""
+import os
+import mmap
+import struct
+from collections.abc import Mapping
+from typing import Optional, Union, Iterator, Tuple
+
+try:
+    from multiprocessing import shared_memory
+    from multiprocessing import resource_tracker
+except ImportError:  # Python < 3.8
+    shared_memory = None
+    resource_tracker = None
+
+
+_MAGIC = b"MYLIBSNP"
+_FORMAT = 2
+# magic, format, number of strings, number of roots, number of items, number of imports, size of string data
+_HEADER = struct.Struct("<8sIIIIIQ")
+# key, name, path, fullname, type, hash, parent, first child, number of children, first import, number of imports
+_ITEM = struct.Struct("<iiiiiiiIiIi")
+# key, type, name, module, alias, level, lookup, resolution, contexts
+_IMPORT = struct.Struct("<iiiiiiiii")
+_OFFSET = struct.Struct("<Q")
+_NONE = -1
+_ABSENT = -2
+_ENCODING = "utf-8"
+_ERRORS = "surrogatepass"
+_ITEM_FIELDS = ("name", "path", "fullname", "type", "hash")
+_CHILDREN = len(_ITEM_FIELDS) + 2
+_IMPORTS = _CHILDREN + 2
+_IMPORT_FIELDS = ("type", "name", "module", "alias", "level", "lookup", "resolution", "contexts")
+_published = set()
+
+
+def _add_string(item: dict, key: str, strings: dict) -> int:
+    """
+    Add a field of an item (or import) to the string table.
+
+    :param item: item (or import)
+    :param key: name of the field
+    :param strings: string table, updated in place
+    :return: index of the string in the table, _NONE if the field is None and _ABSENT if the field does not exist
+    """
+    if key not in item:
+        return _ABSENT
+    value = item[key]
+    if value is None:
+        return _NONE
+    if key == "contexts":
+        value = ",".join(value)
+    return strings.setdefault(value, len(strings))
+
+
+def _pack_import(uid: str, import_item: dict, strings: dict) -> bytes:
+    """
+    Serialize an import into a fixed-size record.
+
+    :param uid: key of the import
+    :param import_item: import
+    :param strings: string table, updated in place
+    """
+    level = import_item.get("level", _ABSENT)
+    return _IMPORT.pack(
+        strings.setdefault(uid, len(strings)),
+        *(_add_string(import_item, key, strings) for key in ("type", "name", "module", "alias")),
+        _NONE if level is None else level,
+        *(_add_string(import_item, key, strings) for key in ("lookup", "resolution", "contexts"))
+    )
+
+
+def _pack_strings(strings: dict) -> Tuple[bytes, bytes]:
+    """
+    Serialize the string table.
+
+    :param strings: string table
+    :return: offsets of strings (one more than the number of strings) and encoded strings
+    """
+    encoded = [value.encode(_ENCODING, _ERRORS) for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return b"".join(_OFFSET.pack(offset) for offset in offsets), b"".join(encoded)
+
+
+def dump_snapshot(tree: dict) -> bytes:
+    """
+    Serialize tree into a flat buffer.
+
+    Items are stored in breadth-first order so that children of an item are contiguous. Strings are deduplicated in a
+    string table and referenced by index.
+
+    :param tree: tree to be serialized
+    :return: buffer
+    """
+    strings = {}
+    items = []
+    imports = []
+    frontier = [(uid, item, -1) for uid, item in tree.items()]
+    index = 0
+    while index < len(frontier):
+        uid, item, parent = frontier[index]
+        children = item.get("children")
+        first_child = len(frontier)
+        if children is not None:
+            frontier.extend((child_uid, child_item, index) for child_uid, child_item in children.items())
+        first_import = len(imports)
+        imports.extend(_pack_import(key, value, strings) for key, value in (item.get("imports") or {}).items())
+        items.append(_ITEM.pack(
+            strings.setdefault(uid, len(strings)),
+            *(_add_string(item, key, strings) for key in _ITEM_FIELDS),
+            parent,
+            first_child,
+            _ABSENT if children is None else len(children),
+            first_import,
+            _ABSENT if "imports" not in item else len(imports) - first_import,
+        ))
+        index += 1
+
+    offsets, data = _pack_strings(strings)
+    return b"".join([_HEADER.pack(_MAGIC, _FORMAT, len(strings), len(tree), len(items), len(imports), len(data)),
+                     offsets] + items + imports + [data])
+
+
+def write_snapshot(tree: dict, path: str) -> None:
+    """
+    Write tree in a snapshot file at specified location, to be opened with TreeSnapshot.from_file.
+
+    :param tree: tree to be written
+    :param path: path of the snapshot file
+    """
+    with open(path, mode="wb") as file_object:
+        file_object.write(dump_snapshot(tree))
+
+
+def publish_snapshot(tree: dict, name: Optional[str] = None) -> "shared_memory.SharedMemory":
+    """
+    Publish tree in a new shared memory block, to be attached with TreeSnapshot.from_shared_memory.
+
+    The caller owns the shared memory block: it must be kept open as long as other processes need it and it must be
+    released with close() and unlink() afterwards.
+
+    :param tree: tree to be published
+    :param name: name of the shared memory block (by default a unique name is generated)
+    :return: shared memory block, its name attribute is to be passed to other processes
+    """
+    if shared_memory is None:
+        raise RuntimeError("shared memory requires Python 3.8 or later, use write_snapshot instead")
+    data = dump_snapshot(tree)
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    block.buf[:len(data)] = data
+    _published.add(block.name)
+    return block
+
+
+class TreeSnapshot:
+    """
+    Read-only tree stored in a flat buffer (see dump_snapshot).
+
+    Nothing is decoded when the snapshot is attached, item fields are decoded when they are accessed.
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview, mmap.mmap], resource: Optional[object] = None):
+        """
+        :param buffer: buffer holding the snapshot
+        :param resource: object owning the buffer (mmap or shared memory block), closed along with the snapshot
+        """
+        self._buffer = memoryview(buffer)
+        self._resource = resource
+        magic, version, n_strings, n_roots, n_items, n_imports, _ = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("buffer does not contain a tree snapshot")
+        if version != _FORMAT:
+            raise ValueError("unsupported tree snapshot format {}".format(version))
+        self._n_roots = n_roots
+        self._offsets = _HEADER.size
+        self._items = self._offsets + (n_strings + 1) * _OFFSET.size
+        self._imports = self._items + n_items * _ITEM.size
+        self._strings = self._imports + n_imports * _IMPORT.size
+
+    @classmethod
+    def from_file(cls, path: str) -> "TreeSnapshot":
+        """
+        Memory-map a snapshot file (see write_snapshot).
+
+        :param path: path of the snapshot file
+        """
+        with open(path, mode="rb") as file_object:
+            mapping = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapping, mapping)
+
+    @classmethod
+    def from_shared_memory(cls, name: str) -> "TreeSnapshot":
+        """
+        Attach to a snapshot published in shared memory (see publish_snapshot).
+
+        :param name: name of the shared memory block
+        """
+        if shared_memory is None:
+            raise RuntimeError("shared memory requires Python 3.8 or later, use TreeSnapshot.from_file instead")
+        block = shared_memory.SharedMemory(name=name)
+        if resource_tracker is not None and os.name == "posix" and block.name not in _published:
+            # Attaching registers the block to the resource tracker which would destroy it when this process exits,
+            # only the process publishing the block is responsible for unlinking it.
+            resource_tracker.unregister(block._name, "shared_memory")  # pylint: disable=protected-access
+        return cls(block.buf, block)
+
+    def close(self) -> None:
+        """
+        Release the buffer. Items obtained from the snapshot must not be used afterwards.
+        """
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._resource is not None:
+            self._resource.close()
+            self._resource = None
+
+    def __enter__(self) -> "TreeSnapshot":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def tree(self) -> Mapping:
+        """
+        Root of the tree, with the same structure than trees built by mylib.deps.build_tree.
+        """
+        return _SnapshotItems(self, 0, self._n_roots)
+
+    def string(self, index: int) -> Union[str, None]:
+        """
+        Decode a string from the string table.
+
+        :param index: index of the string in the table
+        """
+        if index == _NONE:
+            return None
+        start, = _OFFSET.unpack_from(self._buffer, self._offsets + index * _OFFSET.size)
+        end, = _OFFSET.unpack_from(self._buffer, self._offsets + (index + 1) * _OFFSET.size)
+        return str(self._buffer[self._strings + start:self._strings + end], _ENCODING, _ERRORS)
+
+    def item_record(self, index: int) -> tuple:
+        """
+        Get the raw record of an item.
+
+        :param index: index of the item
+        """
+        return _ITEM.unpack_from(self._buffer, self._items + index * _ITEM.size)
+
+    def import_record(self, index: int) -> tuple:
+        """
+        Get the raw record of an import.
+
+        :param index: index of the import
+        """
+        return _IMPORT.unpack_from(self._buffer, self._imports + index * _IMPORT.size)
+
+
+class _SnapshotItems(Mapping):
+    """
+    Contiguous items (or imports) of a snapshot, indexed by key.
+    """
+
+    def __init__(self, snapshot: TreeSnapshot, start: int, count: int, imports: bool = False):
+        self._snapshot = snapshot
+        self._start = start
+        self._count = count
+        self._imports = imports
+        self._keys = None
+
+    def _get(self, index: int) -> Mapping:
+        if self._imports:
+            return _SnapshotImport(self._snapshot, self._snapshot.import_record(index))
+        return _SnapshotItem(self._snapshot, self._snapshot.item_record(index))
+
+    def _key(self, index: int) -> str:
+        record = self._snapshot.import_record(index) if self._imports else self._snapshot.item_record(index)
+        return self._snapshot.string(record[0])
+
+    def __getitem__(self, key: str) -> Mapping:
+        if self._keys is None:
+            self._keys = {self._key(index): index for index in range(self._start, self._start + self._count)}
+        return self._get(self._keys[key])
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._start, self._start + self._count):
+            yield self._key(index)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def items(self) -> Iterator[tuple]:
+        for index in range(self._start, self._start + self._count):
+            yield self._key(index), self._get(index)
+
+    def values(self) -> Iterator[Mapping]:
+        for index in range(self._start, self._start + self._count):
+            yield self._get(index)
+
+
+class _SnapshotItem(Mapping):
+    """
+    Item of a snapshot, fields are decoded when accessed.
+    """
+
+    def __init__(self, snapshot: TreeSnapshot, record: tuple):
+        self._snapshot = snapshot
+        self._record = record
+
+    def __getitem__(self, key: str) -> object:
+        if key in _ITEM_FIELDS:
+            index = self._record[1 + _ITEM_FIELDS.index(key)]
+            if index != _ABSENT:
+                return self._snapshot.string(index)
+        elif key == "children" and self._record[_CHILDREN + 1] != _ABSENT:
+            return _SnapshotItems(self._snapshot, *self._record[_CHILDREN:_CHILDREN + 2])
+        elif key == "imports" and self._record[_IMPORTS + 1] != _ABSENT:
+            return _SnapshotItems(self._snapshot, *self._record[_IMPORTS:_IMPORTS + 2], imports=True)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for position, key in enumerate(_ITEM_FIELDS):
+            if self._record[1 + position] != _ABSENT:
+                yield key
+        if self._record[_CHILDREN + 1] != _ABSENT:
+            yield "children"
+        if self._record[_IMPORTS + 1] != _ABSENT:
+            yield "imports"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class _SnapshotImport(Mapping):
+    """
+    Import of a snapshot, fields are decoded when accessed.
+    """
+
+    def __init__(self, snapshot: TreeSnapshot, record: tuple):
+        self._snapshot = snapshot
+        self._record = record
+
+    def __getitem__(self, key: str) -> object:
+        if key in _IMPORT_FIELDS:
+            index = self._record[1 + _IMPORT_FIELDS.index(key)]
+            if index != _ABSENT:
+                if key == "level":
+                    return None if index == _NONE else index
+                value = self._snapshot.string(index)
+                if key == "contexts" and value is not None:
+                    return value.split(",")
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for position, key in enumerate(_IMPORT_FIELDS):
+            if self._record[1 + position] != _ABSENT:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,2 @@
+from acme.gadgets import core
+import acme.gadgets.core
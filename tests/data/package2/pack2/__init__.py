@@ -0,0 +1,2 @@
+from .tools import helper
+from ._speedups import fast
@@ -0,0 +1 @@
+import typing_only_dependency
@@ -0,0 +1,2 @@
+import pack2.tools.other
+import yaml
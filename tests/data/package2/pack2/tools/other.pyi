@@ -0,0 +1 @@
+def other() -> None: ...
@@ -0,0 +1,31 @@
+import sys
+from typing import TYPE_CHECKING
+
+import attr
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+try:
+    import orjson as fast_json
+except ImportError:
+    import simplejson as fast_json
+
+if TYPE_CHECKING:
+    import numpy
+
+if sys.version_info < (3, 8):
+    import importlib_metadata
+else:
+    import importlib.metadata as importlib_metadata
+
+
+def load():
+    import pandas
+    try:
+        import yaml
+    except (ValueError, ModuleNotFoundError):
+        yaml = None
+    return pandas, yaml
@@ -4,10 +4,12 @@ from pprint import pprint
 import json
 import importlib
 import sys
+import shutil
 
 import pytest
 
-from mylib.deps import build_tree, apply_tree, lookup_imports_tree, get_external_imports, write_tree
+from mylib.deps import build_tree, apply_tree, lookup_imports_tree, get_external_imports, write_tree, \
+    resolve_imports_tree, find_installed, is_builtin, find_tree, get_imports, get_dependencies
 
 
 @pytest.fixture(scope="module")
@@ -28,6 +30,133 @@ def test_build_tree_with_stdlib(tmpdir, package01):
     write_tree(tree, str(tmpdir.join("tree.json")))
 
 
+@pytest.fixture()
+def package02(tmpdir):
+    path = str(tmpdir.join("package2"))
+    shutil.copytree(os.path.join(os.path.dirname(__file__), "data", "package2"), path)
+    extension = os.path.join(path, "pack2", "_speedups{}".format(importlib.machinery.EXTENSION_SUFFIXES[0]))
+    open(extension, mode="w").close()
+    return path
+
+
+def test_namespace_stub_extension(package02):
+    tree = build_tree(package02, ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=True)
+    assert get_external_imports(tree) == {"yaml"}
+    types = {}
+    for item in find_tree(tree, lambda x: x["fullname"] is not None, how="all"):
+        types.setdefault(item["fullname"], set()).add(item["type"])
+    assert types["pack2.tools"] == {"namespace"}
+    assert types["pack2.tools.other"] == {"module", "stub"}
+    assert types["pack2._speedups"] == {"shared_object", "stub"}
+    assert types["acme"] == {"namespace"}
+    assert types["acme.widgets.main"] == {"module"}
+    main = find_tree(tree, lambda x: x["fullname"] == "acme.widgets.main")
+    lookups = {i["name"]: i["lookup"] for i in main["imports"].values()}
+    assert lookups["acme.gadgets.core"] == os.path.join(package02, "acme", "gadgets", "core.py")
+    assert lookups["core"] == os.path.join(package02, "acme", "gadgets")
+    helper = find_tree(tree, lambda x: x["fullname"] == "pack2.tools.helper")
+    lookups = {i["name"]: i["lookup"] for i in helper["imports"].values()}
+    assert lookups["pack2.tools.other"] == os.path.join(package02, "pack2", "tools", "other.py")
+    init = find_tree(tree, lambda x: x["fullname"] == "pack2.__init__")
+    lookups = {i["module"]: i["lookup"] for i in init["imports"].values()}
+    assert lookups["_speedups"].endswith(importlib.machinery.EXTENSION_SUFFIXES[0])
+
+
+def test_src_layout(tmpdir):
+    package = tmpdir.mkdir("src").mkdir("mypackage")
+    package.join("__init__.py").write("")
+    package.join("a.py").write("import mypackage.b\nimport mypackage.missing\nimport yaml\n")
+    package.join("b.py").write("from mypackage import a\n")
+    tmpdir.mkdir("tests").join("test_a.py").write("import pytest\n")
+    tree = build_tree(str(tmpdir), ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=True)
+    assert find_tree(tree, lambda x: x["name"] == "src")["type"] == "namespace"
+    module = find_tree(tree, lambda x: x["fullname"] == "src.mypackage.a")
+    lookups = {i["name"]: i["lookup"] for i in module["imports"].values()}
+    assert lookups["mypackage.b"] == str(package.join("b.py"))
+    assert lookups["mypackage.missing"] == "@internal"
+    assert get_external_imports(tree) == {"yaml", "pytest"}
+
+
+def test_import_contexts():
+    path = os.path.join(os.path.dirname(__file__), "data", "package3")
+    imports = get_imports(os.path.join(path, "pack3", "compat.py"))
+    contexts = {i["module"] if i["type"] == "from-import" else i["name"]: i["contexts"] for i in imports.values()}
+    assert contexts == {
+        "sys": ["module"], "typing": ["module"], "attr": ["module"], "ujson": ["try"], "json": ["except"],
+        "orjson": ["try"], "simplejson": ["except"],
+        "numpy": ["type_checking"], "importlib_metadata": ["version_guard"], "importlib.metadata": ["version_guard"],
+        "pandas": ["function"], "yaml": ["function", "try"],
+    }
+    assert get_dependencies(path) == {"attr", "ujson", "orjson", "simplejson", "numpy", "importlib_metadata",
+                                      "pandas", "yaml"}
+    assert get_dependencies(path, exclude_contexts=["function", "try", "type_checking"]) == {
+        "attr", "importlib_metadata", "simplejson"}
+    assert get_dependencies(path, exclude_contexts=["function", "try", "type_checking", "version_guard"]) == {
+        "attr", "simplejson"}
+    with pytest.raises(ValueError):
+        get_dependencies(path, exclude_contexts=["lazy"])
+
+
+def test_imports_without_contexts(package01):
+    # Trees written by previous versions have no contexts
+    tree = build_tree(package01, ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=False)
+    for module in find_tree(tree, lambda x: x["type"] == "module", how="all"):
+        for import_item in module["imports"].values():
+            del import_item["contexts"]
+    assert get_external_imports(tree) == {"math", "os", "sample", "pandas"}
+    assert get_external_imports(tree, exclude_contexts=["function"]) == {"math", "os", "sample", "pandas"}
+    assert get_external_imports(tree, exclude_contexts=["module"]) == set()
+
+
+def test_resolve_imports(tmpdir, package01):
+    site = tmpdir.mkdir("site-packages")
+    site.mkdir("pandas")
+    site.join("os.py").write("")
+    site.join("math{}".format(importlib.machinery.EXTENSION_SUFFIXES[0])).write("")
+    tree = build_tree(package01, ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=False)
+    listings = {}
+    resolve_imports_tree(tree, paths=[str(site)], listings=listings)
+    assert list(listings) == [str(site)]
+    # Depending on the interpreter, os and math may be built in (or frozen)
+    builtin = {name for name in ["math", "os"] if is_builtin(name)}
+    assert get_external_imports(tree, resolutions=["builtin"]) == builtin
+    assert get_external_imports(tree, resolutions=["installed"]) == {"math", "os", "pandas"} - builtin
+    assert get_external_imports(tree, resolutions=["internal"]) == {"sample"}
+    assert get_external_imports(tree, resolutions=["missing"]) == set()
+    assert find_installed("pandas.core", paths=[str(site)]) == os.path.join(str(site), "pandas")
+    assert find_installed("numpy", paths=[str(site)]) is None
+    assert find_installed("sys", paths=[str(site)]) == "@builtin"
+    assert find_installed("itertools", paths=[]) == "@builtin"
+    with pytest.raises(ValueError):
+        get_external_imports(tree, resolutions=["unknown"])
+
+
+def test_unresolved_imports(package01):
+    tree = build_tree(package01, ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=False)
+    with pytest.raises(ValueError, match="resolve_imports_tree"):
+        get_external_imports(tree, resolutions=["installed"])
+
+
+def _strip_keys(tree):
+    return [{key: _strip_keys(value) if key == "children" else value for key, value in item.items()}
+            for item in tree.values()]
+
+
+def test_build_tree_parallel(package01, package02):
+    for path in [package01, package02]:
+        serial = build_tree(path, ignore_dirs=["__pycache__"])
+        parallel = build_tree(path, ignore_dirs=["__pycache__"], max_workers=4)
+        assert _strip_keys(parallel) == _strip_keys(serial)
+    assert get_dependencies(package01, max_workers=4) == {"sample", "pandas"}
+    with pytest.raises(ValueError):
+        build_tree(package01, max_workers=0)
+
+
 def test_numpy_dependencies(tmpdir):
     # print(importlib.machinery.PathFinder().find_spec("numpy", sys.path))
     path = os.path.dirname(importlib.util.find_spec("numpy").origin)
@@ -0,0 +1,49 @@
+#!coding: utf-8
+import os
+import shutil
+
+import pytest
+
+from mylib.deps import build_tree, lookup_imports_tree, write_tree, read_tree
+from mylib.diff import diff_trees
+
+
+@pytest.fixture(scope="module")
+def package01():
+    return os.path.join(os.path.dirname(__file__), "data", "package1")
+
+
+def _saved_tree(path, tmpdir, name):
+    tree = build_tree(path, ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=True)
+    write_tree(tree, str(tmpdir.join(name)))
+    return read_tree(str(tmpdir.join(name)))
+
+
+def test_diff_trees(tmpdir, package01):
+    old_path = str(tmpdir.join("old"))
+    new_path = str(tmpdir.join("new"))
+    shutil.copytree(package01, old_path, ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(package01, new_path, ignore=shutil.ignore_patterns("__pycache__"))
+    old = _saved_tree(old_path, tmpdir, "old.json")
+    assert diff_trees(old, _saved_tree(new_path, tmpdir, "same.json")) == {"modules": {}, "external": {}}
+    analytics = os.path.join(new_path, "pack", "analytics.py")
+    with open(analytics, mode="r") as file_object:
+        source = file_object.read()
+    with open(analytics, mode="w") as file_object:
+        file_object.write("import yaml\n" + source)
+    with open(os.path.join(new_path, "pack", "sub", "absolute.py"), mode="w") as file_object:
+        file_object.write("import pack.analytics\nfrom pandas import DataFrame\n")
+    with open(os.path.join(new_path, "pack", "extra.py"), mode="w") as file_object:
+        file_object.write("import requests\n")
+    diff = diff_trees(old, _saved_tree(new_path, tmpdir, "new.json"))
+    assert sorted(diff["modules"]) == ["pack/analytics.py", "pack/extra.py", "pack/sub/absolute.py"]
+    assert [i["name"] for i in diff["modules"]["pack/analytics.py"]["added"]] == ["yaml"]
+    assert diff["modules"]["pack/analytics.py"]["removed"] == []
+    assert sorted(i["name"] for i in diff["modules"]["pack/sub/absolute.py"]["removed"]) == [
+        "is_relative", "relative", "sample"]
+    assert diff["external"] == {
+        "requests": {"added": ["pack/extra.py"], "removed": []},
+        "sample": {"added": [], "removed": ["pack/sub/absolute.py"]},
+        "yaml": {"added": ["pack/analytics.py"], "removed": []},
+    }
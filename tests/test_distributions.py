@@ -0,0 +1,65 @@
+#!coding: utf-8
+import os
+
+import pytest
+
+from mylib.distributions import build_distribution_index, get_distribution_index, get_requirements
+from mylib.deps import get_dependencies
+
+
+def _add_distribution(site, name, version, top_level=None, record=None):
+    dist_info = site.mkdir("{}-{}.dist-info".format(name, version))
+    dist_info.join("METADATA").write("Metadata-Version: 2.1\nName: {}\nVersion: {}\n\nDescription\n".format(
+        name, version))
+    if top_level is not None:
+        dist_info.join("top_level.txt").write("\n".join(top_level) + "\n")
+    if record is not None:
+        dist_info.join("RECORD").write("\n".join("{},,".format(r) for r in record) + "\n")
+
+
+@pytest.fixture()
+def site(tmpdir):
+    site = tmpdir.mkdir("site-packages")
+    _add_distribution(site, "PyYAML", "5.3.1", top_level=["_yaml", "yaml"])
+    _add_distribution(site, "python_dateutil", "2.8.1",
+                      record=["dateutil/__init__.py", "dateutil/tz/tz.py", "python_dateutil-2.8.1.dist-info/RECORD",
+                              "six.py", "easy.pth", "__pycache__/six.cpython-37.pyc"])
+    return site
+
+
+def test_build_distribution_index(site):
+    index = build_distribution_index([str(site)])["distributions"]
+    assert index == {
+        "_yaml": [{"name": "PyYAML", "version": "5.3.1"}],
+        "yaml": [{"name": "PyYAML", "version": "5.3.1"}],
+        "dateutil": [{"name": "python_dateutil", "version": "2.8.1"}],
+        "six": [{"name": "python_dateutil", "version": "2.8.1"}],
+    }
+
+
+def test_distribution_index_cache(tmpdir, site):
+    cache_dir = tmpdir.join("cache")
+    index = get_distribution_index([str(site)], cache_dir=str(cache_dir))
+    assert "scipy" not in index
+    assert len(cache_dir.listdir()) == 1
+    _add_distribution(site, "scipy", "1.5.4", top_level=["scipy"])
+    # Make sure modification time changes even on file systems with coarse resolution
+    stat = os.stat(str(site))
+    os.utime(str(site), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    index = get_distribution_index([str(site)], cache_dir=str(cache_dir))
+    assert index["scipy"] == [{"name": "scipy", "version": "1.5.4"}]
+    assert len(cache_dir.listdir()) == 1
+
+
+def test_get_requirements(tmpdir, site):
+    requirements = get_requirements(["yaml", "dateutil.parser", "sample"], paths=[str(site)],
+                                     cache_dir=str(tmpdir.join("cache")))
+    assert requirements == {"PyYAML==5.3.1", "python_dateutil==2.8.1", "sample"}
+
+
+def test_get_dependencies_with_distributions(tmpdir, site):
+    _add_distribution(site, "pandas", "1.1.5", top_level=["pandas"])
+    package01 = os.path.join(os.path.dirname(__file__), "data", "package1")
+    dependencies = get_dependencies(package01, ignore_dirs=["__pycache__"], resolve_distributions=True,
+                                    site_paths=[str(site)], cache_dir=str(tmpdir.join("cache")))
+    assert dependencies == {"pandas==1.1.5", "sample"}
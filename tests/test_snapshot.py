@@ -0,0 +1,68 @@
+#!coding: utf-8
+import os
+import sys
+import struct
+import multiprocessing
+
+import pytest
+
+from mylib.deps import build_tree, lookup_imports_tree, resolve_imports_tree, get_external_imports, find_tree
+from mylib.snapshot import dump_snapshot, write_snapshot, publish_snapshot, TreeSnapshot
+
+
+@pytest.fixture(scope="module")
+def tree():
+    tree = build_tree(os.path.join(os.path.dirname(__file__), "data", "package1"), ignore_dirs=["__pycache__"])
+    lookup_imports_tree(tree, stdlib_lookup=True)
+    resolve_imports_tree(tree, paths=[])
+    return tree
+
+
+def _to_dict(tree):
+    return {uid: {key: _to_dict(value) if key in ["children", "imports"] else value for key, value in item.items()}
+            for uid, item in tree.items()}
+
+
+def _external_imports(name, queue):
+    with TreeSnapshot.from_shared_memory(name) as snapshot:
+        queue.put(get_external_imports(snapshot.tree))
+
+
+def test_snapshot_round_trip(tree):
+    snapshot = TreeSnapshot(dump_snapshot(tree))
+    assert _to_dict(snapshot.tree) == tree
+    assert get_external_imports(snapshot.tree) == {"sample", "pandas"}
+    assert get_external_imports(snapshot.tree, resolutions=["internal"]) == {"sample"}
+    item = find_tree(snapshot.tree, lambda x: x["fullname"] == "pack.sub.absolute")
+    assert item["path"] == find_tree(tree, lambda x: x["fullname"] == "pack.sub.absolute")["path"]
+    with pytest.raises(ValueError):
+        TreeSnapshot(b"\0" * 64)
+    # Snapshots written before items had a hash field must be rejected
+    data = bytearray(dump_snapshot(tree))
+    data[8:12] = struct.pack("<I", 1)
+    with pytest.raises(ValueError):
+        TreeSnapshot(bytes(data))
+
+
+def test_snapshot_file(tmpdir, tree):
+    path = str(tmpdir.join("tree.snapshot"))
+    write_snapshot(tree, path)
+    with TreeSnapshot.from_file(path) as snapshot:
+        assert len(find_tree(snapshot.tree, lambda x: x["type"] == "module", how="all")) == 7
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="shared memory requires Python 3.8 or later")
+def test_snapshot_shared_memory(tree):
+    block = publish_snapshot(tree)
+    try:
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(target=_external_imports, args=(block.name, queue))
+        process.start()
+        assert queue.get(timeout=30) == {"sample", "pandas"}
+        process.join()
+        with TreeSnapshot.from_shared_memory(block.name) as snapshot:
+            assert get_external_imports(snapshot.tree) == {"sample", "pandas"}
+    finally:
+        block.close()
+        block.unlink()